@@ -5,13 +5,7 @@ import io
 import os
 import re
 from datetime import datetime
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image as RLImage
-from reportlab.lib.styles import getSampleStyleSheet
-from pptx import Presentation
-from pptx.util import Inches
-from PIL import Image
+from xml.sax.saxutils import escape
 
 # ----------------- CONFIG / SECRETS -----------------
 ADMIN_USERNAME = st.secrets.get("admin", {}).get("username", "admin")
@@ -20,80 +14,144 @@ ADMIN_PASSWORD = st.secrets.get("admin", {}).get("password", "ete123")
 EXCEL_FILE = "ETE_Robotics-Bom-Data-for-softwares-development.xlsx"
 LOGO_FILE = "ETE-Robotics-Logo.png"
 PPT_TEMPLATE = "ETE_Robotics_Proposal_Customer-Name_Date-Revision.pptx"  # optional template
+EXCEL_ENGINES = ("calamine", "openpyxl")  # fastest first; openpyxl only if python-calamine is unavailable
 
 # ----------------- UTIL: Load BOM Robustly -----------------
-@st.cache_data
+def file_cache_key(path):
+    # mtime + size: cheap, stable cache key for disk-persisted caches (None if the file is missing)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+# (substrings that must all appear in the lower-cased header, canonical name); first match wins
+_COL_PATTERNS = (
+    (("head",), "Head"),
+    (("description",), "Description"),
+    (("model",), "Model/Key Spec"),
+    (("key spec",), "Model/Key Spec"),
+    (("unit", "cost"), "Unit Cost"),
+    (("qty",), "Qty"),
+    (("quantity",), "Qty"),
+    (("s.no",), "S.no"),
+    (("sno",), "S.no"),
+)
+
+# bump when the BOM parsing / index helpers change, so stale disk-cached indexes are not reused
+BOM_INDEX_VERSION = 1
+
+# the only sheet columns the app reads; S.no / UOM / Qty are dropped after header detection
+BOM_COLUMNS = ("Head", "Description", "Model/Key Spec", "Unit Cost")
+
+def canonical_column(name):
+    low = name.lower()
+    return next((canon for pats, canon in _COL_PATTERNS if all(p in low for p in pats)), name)
+
+def frame_from_header_row(raw, header_idx):
+    # same frame as read_excel(header=header_idx), but sliced from an already-parsed header=None sheet
+    header = [f"Unnamed: {col}" if pd.isna(val) else str(val).strip().replace("\n", " ").replace("\r", "")
+              for col, val in zip(raw.columns, raw.iloc[header_idx])]
+    df = raw.iloc[header_idx + 1:].dropna(how="all").infer_objects().reset_index(drop=True)
+    df.columns = header
+    return df
+
+# uncached on purpose: only the small indexes built from the frame are cached (see build_bom_indexes)
 def load_excel_data(path=EXCEL_FILE):
     if not os.path.exists(path):
         return pd.DataFrame()
+    # parse only the BOM columns, once; the header row is located in memory
+    raw = None
+    for engine in EXCEL_ENGINES:
+        try:
+            raw = pd.read_excel(path, header=None, usecols="B:H", engine=engine)
+            break
+        except (ImportError, ValueError):
+            # engine not installed / not known to this pandas: try the next one
+            continue
+        except Exception:
+            return pd.DataFrame()
+    if raw is None:
+        return pd.DataFrame()
     for header_idx in (11, 12, 10, 9):
+        if header_idx >= len(raw):
+            continue
         try:
-            df = pd.read_excel(path, header=header_idx, usecols="B:H", engine="openpyxl")
-            df.columns = [str(c).strip().replace("\n", " ").replace("\r", "") for c in df.columns]
-            rename_map = {}
-            for col in df.columns:
-                low = col.lower()
-                if "head" in low:
-                    rename_map[col] = "Head"
-                elif "description" in low:
-                    rename_map[col] = "Description"
-                elif "model" in low or "key spec" in low:
-                    rename_map[col] = "Model/Key Spec"
-                elif "unit" in low and "cost" in low:
-                    rename_map[col] = "Unit Cost"
-                elif "qty" == low or "quantity" in low:
-                    rename_map[col] = "Qty"
-                elif "s.no" in low or "sno" in low:
-                    rename_map[col] = "S.no"
-            df = df.rename(columns=rename_map)
+            df = frame_from_header_row(raw, header_idx)
+            df.columns = [canonical_column(c) for c in df.columns]
             if "Head" in df.columns and "Model/Key Spec" in df.columns:
-                df = df.dropna(subset=["Head"])
+                df = df.loc[:, df.columns.isin(BOM_COLUMNS)].dropna(subset=["Head"])
                 if "Unit Cost" in df.columns:
-                    df["Unit Cost"] = pd.to_numeric(df["Unit Cost"].astype(str).str.replace(r'[^\d\.\-]', '', regex=True), errors="coerce").fillna(0)
+                    # numeric cells convert directly; only text like "₹ 1,200" goes through the regex cleanup
+                    costs = pd.to_numeric(df["Unit Cost"], errors="coerce")
+                    dirty = costs.isna() & df["Unit Cost"].notna()
+                    if dirty.any():
+                        costs.loc[dirty] = pd.to_numeric(df.loc[dirty, "Unit Cost"].astype(str).str.replace(r'[^\d\.\-]', '', regex=True), errors="coerce")
+                    df["Unit Cost"] = costs.fillna(0)
                 return df
         except Exception:
             continue
-    # fallback attempt
-    try:
-        df2 = pd.read_excel(path, header=12, engine="openpyxl")
-        df2.columns = [str(c).strip().replace("\n", " ").replace("\r", "") for c in df2.columns]
-        return df2
-    except Exception:
-        return pd.DataFrame()
-
-bom_df = load_excel_data()
+    # no recognisable header row: nothing downstream can use the sheet without Head / Model/Key Spec
+    return pd.DataFrame()
 
 # ----------------- Helpers -----------------
+_SPEC_SPLIT_RE = re.compile(r'\s*\|\s*|\s+I\s+|/|;|,')
+_SPEC_SEPARATORS = ("|", "/", ";", ",")
+
 def split_spec_values(cell):
     if not cell or pd.isna(cell):
         return []
     cell = str(cell)
-    parts = re.split(r'\s*\|\s*|\s+I\s+|/|;|,', cell)
-    return [p.strip() for p in parts if p.strip()]
+    # most cells use at most one kind of separator: plain str.split is enough unless " I " could match
+    if "I" not in cell:
+        seps = [sep for sep in _SPEC_SEPARATORS if sep in cell]
+        if not seps:
+            cell = cell.strip()
+            return [cell] if cell else []
+        if len(seps) == 1:
+            return [p for p in (part.strip() for part in cell.split(seps[0])) if p]
+    return [p for p in (part.strip() for part in _SPEC_SPLIT_RE.split(cell)) if p]
 
-@st.cache_data
 def build_model_options(df):
-    options = []
-    if df is None or df.empty: 
-        return options
+    if df is None or df.empty:
+        return ()
     col = "Model/Key Spec"
     if col not in df.columns:
-        return options
-    for val in df[col].dropna().astype(str):
-        options.extend(split_spec_values(val))
-    return sorted(list(set(options)))
-
-MODEL_OPTIONS = build_model_options(bom_df)
-
-def find_unit_cost_for_model(df, chosen_model):
-    if df is None or df.empty or not chosen_model:
-        return 0.0
-    mask = df["Model/Key Spec"].astype(str).str.contains(re.escape(chosen_model), case=False, na=False)
-    if mask.any():
-        vals = df.loc[mask, "Unit Cost"].dropna().astype(float)
-        if not vals.empty:
-            return float(vals.iloc[0])
-    return 0.0
+        return ()
+    # split each distinct cell once (pandas dedupes in C); repeated spec cells are common in the BOM
+    options = set()
+    for val in df[col].dropna().astype(str).unique():
+        options.update(split_spec_values(val))
+    return tuple(sorted(options))
+
+# spec (lower-cased) -> (unit cost, head) of the first BOM row listing it
+def build_spec_index(df):
+    index = {}
+    if df is None or df.empty or "Model/Key Spec" not in df.columns:
+        return index
+    costs = df["Unit Cost"] if "Unit Cost" in df.columns else [0.0] * len(df)
+    heads = df["Head"] if "Head" in df.columns else [""] * len(df)
+    for spec_cell, cost, head in zip(df["Model/Key Spec"], costs, heads):
+        for spec in split_spec_values(spec_cell):
+            index.setdefault(spec.lower(), (0.0 if pd.isna(cost) else float(cost), "" if pd.isna(head) else head))
+    return index
+
+# model options + spec index, disk-cached per workbook version (the frame itself is not kept)
+@st.cache_data(persist="disk", max_entries=1, show_spinner=False)
+def build_bom_indexes(path=EXCEL_FILE, file_key=None, version=None):
+    df = load_excel_data(path)
+    return build_model_options(df), build_spec_index(df)
+
+MODEL_PLACEHOLDER = "-- select --"
+
+# options, selectbox choices (placeholder first) and spec index, shared read-only by every session and rerun
+@st.cache_resource(show_spinner=False)
+def load_bom_indexes(path=EXCEL_FILE, file_key=None, version=None):
+    options, index = build_bom_indexes(path, file_key, version)
+    return options, (MODEL_PLACEHOLDER,) + options, index
+
+BOM_FILE_KEY = file_cache_key(EXCEL_FILE)
+MODEL_OPTIONS, MODEL_CHOICES, SPEC_INDEX = load_bom_indexes(EXCEL_FILE, BOM_FILE_KEY, BOM_INDEX_VERSION)
 
 # ----------------- UI helpers -----------------
 BREADCRUMB_CSS = """
@@ -105,22 +163,71 @@ BREADCRUMB_CSS = """
 </style>
 """
 
+BREADCRUMB_LABELS = {1: "Step 1: Customer Info", 2: "Step 2: RFQ Checklist", 3: "Step 3: Submit & Generate"}
+
+def sync_step_from_breadcrumb():
+    st.session_state.step = st.session_state.breadcrumb
+
 # ----------------- PDF generator (defensive) -----------------
+# reportlab / python-pptx are imported inside the generators, not at app start
+
+# paragraph and table styles are immutable once built, so every PDF shares them
+@st.cache_resource(show_spinner=False)
+def pdf_styles():
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import TableStyle
+    sheet = getSampleStyleSheet()
+    bold = ParagraphStyle("RFQBold", parent=sheet['Normal'], fontName="Helvetica-Bold")
+    return {
+        "Title": sheet['Title'],
+        "Heading3": sheet['Heading3'],
+        "Normal": sheet['Normal'],
+        "Bold": bold,
+        "cust_table": TableStyle([('VALIGN', (0,0), (-1,-1), 'TOP'), ('INNERGRID', (0,0), (-1,-1), 0.25, colors.grey), ('FONTNAME', (0,0), (0,-1), bold.fontName)]),
+        "kv_table": TableStyle([('VALIGN',(0,0),(-1,-1),'TOP')]),
+        "items_table": TableStyle([('GRID',(0,0),(-1,-1),0.3,colors.grey), ('BACKGROUND',(0,0),(-1,0),colors.HexColor("#f5f5f5")), ('ALIGN',(-2,1),(-1,-1),'RIGHT')]),
+    }
+
 def ensure_table_data(rows):
     # Ensure at least one row and one column: convert empty dict to [[ "No data", "" ]]
     if not rows or (isinstance(rows, list) and len(rows) == 0):
         return [["", ""]]
     return rows
 
-def create_pdf(customer_info, requirements, rfq_checklist, items):
+# PDF logo bytes, read from disk once per process
+@st.cache_resource(show_spinner=False)
+def load_logo_bytes(path, file_key=None):
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+# generated documents cached as bytes, keyed on the inputs plus the logo / template file keys
+@st.cache_data(max_entries=8, ttl=3600, show_spinner=False)
+def create_pdf(customer_info, requirements, rfq_checklist, items, logo_key=None):
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, LongTable, Image as RLImage
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+
+    def pdf_cell(value, width, style):
+        # plain strings are much cheaper than Paragraphs; only text that would overflow the cell gets wrapped
+        text = str(value)
+        if "\n" not in text and stringWidth(text, style.fontName, style.fontSize) <= width - 12:
+            return text
+        return Paragraph(escape(text), style)
+
     buf = io.BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=A4, rightMargin=36, leftMargin=36, topMargin=36, bottomMargin=36)
-    styles = getSampleStyleSheet()
+    # flate-compress page streams explicitly rather than relying on the rl_config default
+    doc = SimpleDocTemplate(buf, pagesize=A4, rightMargin=36, leftMargin=36, topMargin=36, bottomMargin=36, pageCompression=1)
+    styles = pdf_styles()
+    normal = styles['Normal']
     story = []
     # logo
-    if os.path.exists(LOGO_FILE):
+    logo = load_logo_bytes(LOGO_FILE, logo_key)
+    if logo:
         try:
-            story.append(RLImage(LOGO_FILE, width=150, height=45))
+            story.append(RLImage(io.BytesIO(logo), width=150, height=45))
         except Exception:
             pass
     story.append(Spacer(1, 6))
@@ -128,67 +235,71 @@ def create_pdf(customer_info, requirements, rfq_checklist, items):
     story.append(Spacer(1, 10))
 
     # Customer Info
-    cust_rows = []
-    if customer_info:
-        for k, v in customer_info.items():
-            cust_rows.append([Paragraph(f"<b>{k}</b>", styles['Normal']), Paragraph(str(v), styles['Normal'])])
-    cust_rows = ensure_table_data(cust_rows)
+    cust_rows = ensure_table_data([[pdf_cell(k, 120, styles['Bold']), pdf_cell(v, 360, normal)] for k, v in (customer_info or {}).items()])
     t = Table(cust_rows, colWidths=[120, 360])
-    t.setStyle(TableStyle([('VALIGN', (0,0), (-1,-1), 'TOP'), ('INNERGRID', (0,0), (-1,-1), 0.25, colors.grey)]))
+    t.setStyle(styles['cust_table'])
     story.append(t)
     story.append(Spacer(1, 8))
 
     # Requirements
-    req_rows = []
-    if requirements:
-        for k, v in requirements.items():
-            req_rows.append([Paragraph(f"{k}", styles['Normal']), Paragraph(str(v), styles['Normal'])])
-    req_rows = ensure_table_data(req_rows)
+    req_rows = ensure_table_data([[pdf_cell(k, 160, normal), pdf_cell(v, 320, normal)] for k, v in (requirements or {}).items()])
     story.append(Paragraph("<b>Requirements</b>", styles['Heading3']))
     rt = Table(req_rows, colWidths=[160, 320])
-    rt.setStyle(TableStyle([('VALIGN',(0,0),(-1,-1),'TOP')]))
+    rt.setStyle(styles['kv_table'])
     story.append(rt)
     story.append(Spacer(1, 8))
 
     # RFQ Checklist
-    chk_rows = []
-    if rfq_checklist:
-        for k, v in rfq_checklist.items():
-            chk_rows.append([Paragraph(str(k), styles['Normal']), Paragraph(str(v), styles['Normal'])])
-    chk_rows = ensure_table_data(chk_rows)
+    chk_rows = ensure_table_data([[pdf_cell(k, 160, normal), pdf_cell(v, 320, normal)] for k, v in (rfq_checklist or {}).items()])
     story.append(Paragraph("<b>RFQ Checklist</b>", styles['Heading3']))
     ct = Table(chk_rows, colWidths=[160, 320])
-    ct.setStyle(TableStyle([('VALIGN',(0,0),(-1,-1),'TOP')]))
+    ct.setStyle(styles['kv_table'])
     story.append(ct)
     story.append(Spacer(1, 8))
 
     # Items table
     if items:
+        total = sum(float(it.get("LineCost", 0)) for it in items)
         table_data = [["S.no", "Head", "Model/Spec", "Qty", "Unit Cost", "Line Cost (INR)"]]
-        total = 0.0
-        for it in items:
-            table_data.append([it.get("S.no",""), it.get("Head",""), it.get("ModelSpec",""), str(it.get("Qty","")), f"{it.get('UnitCost',0):,.2f}", f"{it.get('LineCost',0):,.2f}"])
-            total += float(it.get("LineCost", 0))
+        table_data += [[it.get("S.no",""), it.get("Head",""), it.get("ModelSpec",""), str(it.get("Qty","")), f"{it.get('UnitCost',0):,.2f}", f"{it.get('LineCost',0):,.2f}"] for it in items]
         table_data.append(["", "", "", "", "Total", f"{total:,.2f}"])
-        tbl = Table(table_data, colWidths=[40, 140, 160, 50, 80, 90])
-        tbl.setStyle(TableStyle([('GRID',(0,0),(-1,-1),0.3,colors.grey), ('BACKGROUND',(0,0),(-1,0),colors.HexColor("#f5f5f5")), ('ALIGN',(-2,1),(-1,-1),'RIGHT')]))
+        # LongTable lays out large BOMs in linear time; header row repeats on every page
+        tbl = LongTable(table_data, colWidths=[40, 140, 160, 50, 80, 90], repeatRows=1)
+        tbl.setStyle(styles['items_table'])
         story.append(tbl)
         story.append(Spacer(1, 8))
 
     doc.build(story)
-    buf.seek(0)
-    return buf
+    return buf.getvalue()
 
 # ----------------- PPT generator (uses template if present) -----------------
-def create_ppt(customer_info, requirements, rfq_checklist, items):
+# raw .pptx bytes, read from disk once per process; each deck is opened from an in-memory copy
+@st.cache_resource(show_spinner=False)
+def load_template_bytes(path, file_key=None):
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+def set_cell_text(tc, text):
+    # tc is a freshly created <a:tc> element, which holds a single empty paragraph
+    tc.get_or_add_txBody().p_lst[0].add_r().text = text
+
+@st.cache_data(max_entries=8, ttl=3600, show_spinner=False)
+def create_ppt(customer_info, requirements, rfq_checklist, items, template_key=None):
+    import pptx
+    from pptx import Presentation
+    from pptx.util import Inches
     prs = None
-    if os.path.exists(PPT_TEMPLATE):
+    template_bytes = load_template_bytes(PPT_TEMPLATE, template_key)
+    if template_bytes:
         try:
-            prs = Presentation(PPT_TEMPLATE)
+            prs = Presentation(io.BytesIO(template_bytes))
         except Exception:
-            prs = Presentation()
-    else:
-        prs = Presentation()
+            prs = None
+    if prs is None:
+        default_template = os.path.join(os.path.dirname(pptx.__file__), "templates", "default.pptx")
+        prs = Presentation(io.BytesIO(load_template_bytes(default_template)))
 
     # Title slide (use layout 0 if available)
     try:
@@ -234,24 +345,20 @@ def create_ppt(customer_info, requirements, rfq_checklist, items):
         width = Inches(9)
         height = Inches(0.8)
         table = slide.shapes.add_table(rows, cols, left, top, width, height).table
-        table.cell(0,0).text = "S.no"
-        table.cell(0,1).text = "Model/Spec"
-        table.cell(0,2).text = "Head"
-        table.cell(0,3).text = "Qty"
-        table.cell(0,4).text = "Line Cost (INR)"
-        r = 1; total = 0.0
-        for it in items:
-            table.cell(r,0).text = str(it.get("S.no",""))
-            table.cell(r,1).text = str(it.get("ModelSpec",""))
-            table.cell(r,2).text = str(it.get("Head",""))
-            table.cell(r,3).text = str(it.get("Qty",""))
-            table.cell(r,4).text = f"{it.get('LineCost',0):,.2f}"
+        # fill the <a:tr>/<a:tc> elements directly (table.rows[i] re-queries XPath per row)
+        tr_lst = table._tbl.tr_lst
+        for tc, label in zip(tr_lst[0].tc_lst, ("S.no", "Model/Spec", "Head", "Qty", "Line Cost (INR)")):
+            set_cell_text(tc, label)
+        total = 0.0
+        for tr, it in zip(tr_lst[1:], items):
+            values = (str(it.get("S.no","")), str(it.get("ModelSpec","")), str(it.get("Head","")), str(it.get("Qty","")), f"{it.get('LineCost',0):,.2f}")
+            for tc, val in zip(tr.tc_lst, values):
+                set_cell_text(tc, val)
             total += float(it.get('LineCost',0))
-            r += 1
         # last row total
-        if r <= rows-1:
-            table.cell(r,2).text = "Total"
-            table.cell(r,4).text = f"{total:,.2f}"
+        total_tcs = tr_lst[-1].tc_lst
+        set_cell_text(total_tcs[2], "Total")
+        set_cell_text(total_tcs[4], f"{total:,.2f}")
 
     # Checklist slide
     slide = prs.slides.add_slide(prs.slide_layouts[5] if len(prs.slide_layouts) > 5 else prs.slide_layouts[1])
@@ -262,8 +369,7 @@ def create_ppt(customer_info, requirements, rfq_checklist, items):
 
     out = io.BytesIO()
     prs.save(out)
-    out.seek(0)
-    return out
+    return out.getvalue()
 
 # ----------------- Session state -----------------
 if "step" not in st.session_state: st.session_state.step = 1
@@ -271,6 +377,13 @@ if "customer_info" not in st.session_state: st.session_state.customer_info = {}
 if "requirements" not in st.session_state: st.session_state.requirements = {}
 if "rfq_checklist" not in st.session_state: st.session_state.rfq_checklist = {}
 if "selected_items" not in st.session_state: st.session_state.selected_items = []
+# display frame for selected_items, appended to on Add Item instead of rebuilt on every rerun
+ITEM_TABLE_COLUMNS = ["ModelSpec","Head","Qty","UnitCost","LineCost"]
+if "selected_items_df" not in st.session_state:
+    st.session_state.selected_items_df = pd.DataFrame(st.session_state.selected_items, columns=ITEM_TABLE_COLUMNS)
+# sum of LineCost over selected_items, kept up to date on Add Item so Step 3 does not re-sum every rerun
+if "running_total" not in st.session_state:
+    st.session_state.running_total = sum(float(it.get("LineCost", 0)) for it in st.session_state.selected_items)
 
 # ----------------- Top layout: logo (small left) + breadcrumb center -----------------
 st.set_page_config(page_title="ETE RFQ Builder", layout="wide")
@@ -280,16 +393,10 @@ with top1:
         st.image(LOGO_FILE, width=110)
 with top2:
     st.markdown(BREADCRUMB_CSS, unsafe_allow_html=True)
-    cols = st.columns([1,1,1])
-    labels = ["Step 1: Customer Info", "Step 2: RFQ Checklist", "Step 3: Submit & Generate"]
-    for idx, c in enumerate(cols, start=1):
-        with c:
-            if st.session_state.step == idx:
-                if st.button(labels[idx-1], key=f"bc{idx}"):
-                    st.session_state.step = idx
-            else:
-                if st.button(labels[idx-1], key=f"bc{idx}_off"):
-                    st.session_state.step = idx
+    # a single radio mirrors st.session_state.step (also moved by Save & Next / Back) instead of three buttons
+    st.session_state.breadcrumb = st.session_state.step
+    st.radio("Steps", list(BREADCRUMB_LABELS), format_func=BREADCRUMB_LABELS.get, key="breadcrumb",
+             horizontal=True, label_visibility="collapsed", on_change=sync_step_from_breadcrumb)
 
 st.write("---")
 
@@ -333,16 +440,10 @@ if st.session_state.step == 1:
         st.success("Step 1 data saved.")
         if save_next:
             st.session_state.step = 2
-            try:
-                st.experimental_rerun()
-            except Exception:
-                pass
+            st.rerun()
     if reset:
         st.session_state.customer_info = {}
-        try:
-            st.experimental_rerun()
-        except Exception:
-            pass
+        st.rerun()
 
 # ----------------- Step 2 -----------------
 elif st.session_state.step == 2:
@@ -378,7 +479,7 @@ elif st.session_state.step == 2:
         st.subheader("E) Bill of Quantity")
         b1, b2, b3 = st.columns([2,1,1])
         with b1:
-            chosen_model = st.selectbox("Select Model / Key Spec (from BOM)", ["-- select --"] + MODEL_OPTIONS, index=0)
+            chosen_model = st.selectbox("Select Model / Key Spec (from BOM)", MODEL_CHOICES, index=0)
         with b2:
             chosen_qty = st.number_input("Qty", min_value=1, value=1)
         with b3:
@@ -386,7 +487,7 @@ elif st.session_state.step == 2:
 
         st.markdown("**Current selected items**")
         if st.session_state.selected_items:
-            st.dataframe(pd.DataFrame(st.session_state.selected_items)[["ModelSpec","Head","Qty","UnitCost","LineCost"]], use_container_width=True)
+            st.dataframe(st.session_state.selected_items_df, use_container_width=True)
         else:
             st.info("No BOM items added yet. Use the selector above to add items from BOM.")
 
@@ -398,22 +499,21 @@ elif st.session_state.step == 2:
         with c3:
             back = st.form_submit_button("Back to Step 1")
 
-    if add_btn and chosen_model and chosen_model != "-- select --":
-        unit_cost = find_unit_cost_for_model(bom_df, chosen_model)
+    if add_btn and chosen_model and chosen_model != MODEL_PLACEHOLDER:
+        unit_cost, head_val = SPEC_INDEX.get(chosen_model.lower(), (0.0, ""))
         line_cost = unit_cost * chosen_qty
-        head_val = ""
-        if not bom_df.empty:
-            mask = bom_df["Model/Key Spec"].astype(str).str.contains(re.escape(chosen_model), case=False, na=False)
-            if mask.any():
-                try:
-                    head_val = bom_df.loc[mask, "Head"].iloc[0]
-                except Exception:
-                    head_val = ""
         item = {"S.no": len(st.session_state.selected_items)+1, "ModelSpec": chosen_model, "Head": head_val, "Qty": int(chosen_qty), "UnitCost": float(unit_cost), "LineCost": float(line_cost)}
         st.session_state.selected_items.append(item)
+        st.session_state.running_total += item["LineCost"]
+        new_row = pd.DataFrame([item], columns=ITEM_TABLE_COLUMNS)
+        # the first row replaces the empty seed frame instead of being concatenated onto it
+        if st.session_state.selected_items_df.empty:
+            st.session_state.selected_items_df = new_row
+        else:
+            st.session_state.selected_items_df = pd.concat([st.session_state.selected_items_df, new_row], ignore_index=True)
         st.success(f"Added {chosen_model} x {chosen_qty}")
 
-    if save2:
+    if save2 or save_next2:
         st.session_state.rfq_checklist = {
             "Project Description": project_desc,
             "Proposal No": proposal_no,
@@ -424,29 +524,14 @@ elif st.session_state.step == 2:
             "Concept Layout": concept_layout,
             "Key Features": key_features
         }
-        st.success("Step 2 data saved.")
-    if save_next2:
-        st.session_state.rfq_checklist = {
-            "Project Description": project_desc,
-            "Proposal No": proposal_no,
-            "Assigned To": assigned_to,
-            "Customer": customer_repeat,
-            "Date": str(chk_date),
-            "Project Summary": {"Type": ps_type, "Application": ps_application, "Cycle Time": cycle_time, "Variants": no_of_variants, "Delivery Time": delivery_time, "I&C Location": i_and_c_location},
-            "Concept Layout": concept_layout,
-            "Key Features": key_features
-        }
-        st.session_state.step = 3
-        try:
-            st.experimental_rerun()
-        except Exception:
-            pass
+        if save2:
+            st.success("Step 2 data saved.")
+        if save_next2:
+            st.session_state.step = 3
+            st.rerun()
     if back:
         st.session_state.step = 1
-        try:
-            st.experimental_rerun()
-        except Exception:
-            pass
+        st.rerun()
 
 # ----------------- Step 3 -----------------
 elif st.session_state.step == 3:
@@ -457,27 +542,22 @@ elif st.session_state.step == 3:
     st.markdown("**RFQ Checklist**"); st.json(st.session_state.rfq_checklist)
     st.markdown("**Selected BOM Items**")
     if st.session_state.selected_items:
-        st.dataframe(pd.DataFrame(st.session_state.selected_items)[["ModelSpec","Head","Qty","UnitCost","LineCost"]], use_container_width=True)
+        st.dataframe(st.session_state.selected_items_df, use_container_width=True)
     else:
         st.info("No items selected.")
 
-    total = sum([it.get("LineCost",0) for it in st.session_state.selected_items]) if st.session_state.selected_items else 0.0
+    total = st.session_state.running_total
     st.markdown(f"### Total Estimated Cost: **₹ {total:,.2f}**")
 
     c1, c2 = st.columns([1,1])
     with c1:
         if st.button("Back to Step 2"):
             st.session_state.step = 2
-            try:
-                st.experimental_rerun()
-            except Exception:
-                pass
+            st.rerun()
     with c2:
         if st.button("Generate PDF & PPT"):
-            pdf_bytes = create_pdf(st.session_state.customer_info, st.session_state.requirements, st.session_state.rfq_checklist, st.session_state.selected_items)
-            ppt_bytes = create_ppt(st.session_state.customer_info, st.session_state.requirements, st.session_state.rfq_checklist, st.session_state.selected_items)
+            pdf_bytes = create_pdf(st.session_state.customer_info, st.session_state.requirements, st.session_state.rfq_checklist, st.session_state.selected_items, file_cache_key(LOGO_FILE))
+            ppt_bytes = create_ppt(st.session_state.customer_info, st.session_state.requirements, st.session_state.rfq_checklist, st.session_state.selected_items, file_cache_key(PPT_TEMPLATE))
             st.success("Generated PDF & PPT. Download below.")
             st.download_button("Download PDF", data=pdf_bytes, file_name=f"{st.session_state.customer_info.get('RFQ Reference','RFQ')}.pdf", mime="application/pdf")
             st.download_button("Download PPTX", data=ppt_bytes, file_name=f"{st.session_state.customer_info.get('RFQ Reference','RFQ')}.pptx", mime="application/vnd.openxmlformats-officedocument.presentationml.presentation")
-            st.session_state.last_pdf = pdf_bytes.getvalue()
-            st.session_state.last_pptx = ppt_bytes.getvalue()